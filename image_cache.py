@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# --- IMAGE PREFETCH CACHE ---
+# Product images (mostly Shopify CDN) recur across renders, so keep them on disk.
+# IMAGE_CACHE_MAX_BYTES is a soft limit: recently used files (IMAGE_CACHE_MIN_AGE)
+# may push past it, but never past IMAGE_CACHE_HARD_MAX_BYTES.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+IMAGE_CACHE_HARD_MAX_BYTES = int(os.getenv("IMAGE_CACHE_HARD_MAX_BYTES", str(IMAGE_CACHE_MAX_BYTES * 2)))
+# Larger downloads are aborted and the renderer gets the raw URL instead
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(IMAGE_CACHE_MAX_BYTES // 20)))
+IMAGE_PREFETCH_WORKERS = int(os.getenv("IMAGE_PREFETCH_WORKERS", "8"))
+IMAGE_FETCH_TIMEOUT = 20
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Files touched more recently than this may still be read by another worker's renderer
+IMAGE_CACHE_MIN_AGE = int(os.getenv("IMAGE_CACHE_MIN_AGE", str(30 * 60)))
+# Temp files older than this are leftovers from a crashed or failed write
+STALE_TMP_AGE = 60 * 60
+
+# 🟢 One pooled session per worker process (keep-alive to the CDN)
+http_session = requests.Session()
+http_adapter = HTTPAdapter(pool_connections=IMAGE_PREFETCH_WORKERS, pool_maxsize=IMAGE_PREFETCH_WORKERS)
+http_session.mount("http://", http_adapter)
+http_session.mount("https://", http_adapter)
+
+# --- HELPER FUNCTIONS ---
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(IMAGE_CACHE_DIR, key), os.path.join(IMAGE_CACHE_DIR, key + ".json")
+
+def _write_atomic(path, chunks):
+    fd, tmp_path = tempfile.mkstemp(dir=IMAGE_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _iter_limited(resp, limit):
+    received = 0
+    for chunk in resp.iter_content(chunk_size=IMAGE_CHUNK_SIZE):
+        received += len(chunk)
+        if received > limit:
+            raise ValueError(f"image larger than {limit} bytes")
+        yield chunk
+
+def fetch_image_cached(url):
+    """Returns a local path for url, revalidating any cached copy with its ETag."""
+    data_path, meta_path = _cache_paths(url)
+    headers = {}
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path) as f:
+                etag = json.load(f).get("etag")
+            if etag:
+                headers["If-None-Match"] = etag
+        except (OSError, ValueError):
+            pass
+
+    with http_session.get(url, headers=headers, timeout=IMAGE_FETCH_TIMEOUT, stream=True) as resp:
+        if resp.status_code == 304:
+            os.utime(data_path, None)  # mark as recently used for eviction
+            return data_path
+        resp.raise_for_status()
+
+        content_type = resp.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            raise ValueError(f"unexpected Content-Type {content_type!r}")
+        content_length = resp.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > IMAGE_MAX_BYTES:
+            raise ValueError(f"image larger than {IMAGE_MAX_BYTES} bytes")
+
+        # Drop the old ETag first so a crash mid-update can only cause a re-download,
+        # never pair the new image with a stale ETag
+        _remove(meta_path)
+        _write_atomic(data_path, _iter_limited(resp, IMAGE_MAX_BYTES))
+        meta = {"url": url, "etag": resp.headers.get("ETag")}
+        _write_atomic(meta_path, [json.dumps(meta).encode("utf-8")])
+        return data_path
+
+def prune_image_cache(keep=()):
+    """Evicts least recently used images until the cache fits IMAGE_CACHE_MAX_BYTES.
+
+    Paths in keep are never evicted. Anything used within IMAGE_CACHE_MIN_AGE is
+    only evicted once the cache is over IMAGE_CACHE_HARD_MAX_BYTES.
+    """
+    now = time.time()
+    keep = set(keep)
+    entries = []
+    recent = []
+    total = 0
+    for name in os.listdir(IMAGE_CACHE_DIR):
+        path = os.path.join(IMAGE_CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+
+        if name.endswith(".tmp"):
+            if now - st.st_mtime > STALE_TMP_AGE:
+                _remove(path)
+            else:
+                total += st.st_size
+            continue
+
+        total += st.st_size
+        if name.endswith(".json"):
+            continue
+        if path in keep:
+            continue
+        size = st.st_size
+        try:
+            size += os.path.getsize(path + ".json")
+        except OSError:
+            pass
+        if now - st.st_mtime < IMAGE_CACHE_MIN_AGE:
+            recent.append((st.st_mtime, size, path))
+        else:
+            entries.append((st.st_mtime, size, path))
+
+    for candidates, limit in ((entries, IMAGE_CACHE_MAX_BYTES), (recent, IMAGE_CACHE_HARD_MAX_BYTES)):
+        candidates.sort()
+        for _, size, path in candidates:
+            if total <= limit:
+                break
+            _remove(path + ".json")
+            _remove(path)
+            total -= size
+
+def prefetch_images(image_urls):
+    """Downloads all images concurrently; falls back to the raw URL if a fetch fails."""
+    if not image_urls:
+        return image_urls
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"⚠️ Image cache unavailable, using raw URLs: {e}")
+        return image_urls
+
+    def fetch(url):
+        try:
+            return fetch_image_cached(url)
+        except Exception as e:
+            print(f"⚠️ Image prefetch failed for {url}: {e}")
+            return url
+
+    # Only remote URLs are fetched (each once); anything else is passed through as-is
+    unique_urls = list(dict.fromkeys(
+        u for u in image_urls if isinstance(u, str) and u.startswith(("http://", "https://"))
+    ))
+    resolved = {}
+    if unique_urls:
+        with ThreadPoolExecutor(max_workers=min(IMAGE_PREFETCH_WORKERS, len(unique_urls))) as pool:
+            resolved = dict(zip(unique_urls, pool.map(fetch, unique_urls)))
+
+    try:
+        prune_image_cache(keep=resolved.values())
+    except OSError as e:
+        print(f"⚠️ Image cache prune failed: {e}")
+
+    # A file can still vanish underneath us (another worker, manual cleanup)
+    for url, path in resolved.items():
+        if path != url and not os.path.exists(path):
+            resolved[url] = url
+
+    return [resolved.get(u, u) if isinstance(u, str) else u for u in image_urls]
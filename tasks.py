@@ -10,6 +10,7 @@ load_dotenv()
 
 # 🟢 CRITICAL IMPORT: Imports the updated video generation logic from utils.py
 from utils import generate_video_from_images 
+from image_cache import prefetch_images
 
 # --- 1. CELERY CONFIGURATION (Windows Compatible) ---
 redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -54,11 +55,15 @@ def process_video_job_task(job_id, image_urls, title, desc, logo_url, voice_gend
         )
 
     try:
+        update_progress_db(5)
+
+        # 🟢 Download all product images up front so rendering works from local files
+        local_images = prefetch_images(image_urls)
         update_progress_db(10)
 
         # 🟢 Pass the overrides into the generator function
         filename, script_used = generate_video_from_images(
-            image_urls=image_urls, 
+            image_urls=local_images, 
             product_title=title, 
             product_desc=desc, 
             logo_url=logo_url, 
@@ -0,0 +1,137 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import image_cache
+
+BODY = b"x" * 100
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        etag = f'"{self.path}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        content_type = "text/html" if self.path.startswith("/html") else "image/jpeg"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        # /stream omits Content-Length so only the streamed byte count can catch it
+        if not self.path.startswith("/stream"):
+            self.send_header("Content-Length", str(len(BODY)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    ImageHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_MIN_AGE", 0)
+    return tmp_path
+
+
+def test_fetch_caches_then_revalidates_with_etag(server):
+    url = f"{server}/a"
+    first = image_cache.prefetch_images([url])
+    second = image_cache.prefetch_images([url])
+
+    assert first == second
+    assert first[0] != url and os.path.exists(first[0])
+    assert ImageHandler.requests_seen == [("/a", None), ("/a", '"/a"')]
+
+
+def test_prune_keeps_current_job_files(server, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_MAX_BYTES", 150)
+    image_cache.prefetch_images([f"{server}/a"])
+
+    paths = image_cache.prefetch_images([f"{server}/a", f"{server}/b"])
+
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_prune_evicts_least_recently_used(server, monkeypatch):
+    old = image_cache.prefetch_images([f"{server}/a"])[0]
+    os.utime(old, (0, 0))
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_MAX_BYTES", 150)
+
+    new = image_cache.prefetch_images([f"{server}/b"])[0]
+
+    assert not os.path.exists(old)
+    assert not os.path.exists(old + ".json")
+    assert os.path.exists(new)
+
+
+def test_hard_limit_evicts_recently_used(server, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_MIN_AGE", 3600)
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_MAX_BYTES", 100)
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_HARD_MAX_BYTES", 250)
+    first = image_cache.prefetch_images([f"{server}/a"])[0]
+    os.utime(first, (1, 1))
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_MIN_AGE", 10**12)
+
+    paths = image_cache.prefetch_images([f"{server}/b", f"{server}/c"])
+
+    assert not os.path.exists(first)
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_prune_removes_stale_tmp_files(cache_dir):
+    stale = cache_dir / "leftover.tmp"
+    stale.write_bytes(BODY)
+    os.utime(stale, (0, 0))
+
+    image_cache.prune_image_cache()
+
+    assert not stale.exists()
+
+
+def test_non_image_response_falls_back_to_url(server, cache_dir):
+    url = f"{server}/html"
+    assert image_cache.prefetch_images([url]) == [url]
+    assert os.listdir(cache_dir) == []
+
+
+def test_non_url_inputs_pass_through(server):
+    item = {"src": f"{server}/a"}
+    result = image_cache.prefetch_images([item, "/local.png", f"{server}/a"])
+
+    assert result[:2] == [item, "/local.png"]
+    assert os.path.exists(result[2])
+
+
+@pytest.mark.parametrize("path", ["/a", "/stream"])
+def test_oversized_image_falls_back_to_url(server, cache_dir, monkeypatch, path):
+    monkeypatch.setattr(image_cache, "IMAGE_MAX_BYTES", len(BODY) - 1)
+    url = f"{server}{path}"
+
+    assert image_cache.prefetch_images([url]) == [url]
+    assert os.listdir(cache_dir) == []
+
+
+def test_unwritable_cache_dir_falls_back_to_urls(server, tmp_path, monkeypatch):
+    blocker = tmp_path / "blocker"
+    blocker.write_bytes(b"")
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_DIR", str(blocker / "cache"))
+    urls = [f"{server}/a", {"src": f"{server}/b"}]
+
+    assert image_cache.prefetch_images(urls) == urls
+    assert ImageHandler.requests_seen == []